@@ -1,10 +1,14 @@
 # /// script
 # dependencies = [
 #   "fastapi>=0.104",
+#   "httptools>=0.6",
 #   "uvicorn>=0.24",
+#   "uvloop>=0.19",
 # ]
 # ///
 
+import os
+
 from fastapi import FastAPI
 import uvicorn
 
@@ -20,4 +24,12 @@ async def predict(payload: dict):
     return {"prediction": 42.3}
 
 if __name__ == "__main__":
-    uvicorn.run("app:app", host="0.0.0.0", port=8000, log_level="info")
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=os.cpu_count() or 1,
+        loop="uvloop",
+        http="httptools",
+        log_level="warning",
+    )
@@ -1,23 +1,44 @@
 # /// script
 # dependencies = [
 #   "fastapi>=0.104",
+#   "pydantic>=2",
+#   "httptools>=0.6",
 #   "uvicorn>=0.24",
+#   "uvloop>=0.19",
 # ]
 # ///
 
+import os
+
 from fastapi import FastAPI
+from pydantic import BaseModel
 import uvicorn
 
 app = FastAPI()
 
+class PredictIn(BaseModel):
+    text: str
+
+class PredictOut(BaseModel):
+    label: str
+    score: float
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
 @app.post("/predict")
-async def predict(payload: dict):
+async def predict(payload: PredictIn) -> PredictOut:
     # Stub implementation - in a real app this would run ML inference
-    return {"label": "positive", "score": 0.95}
+    return PredictOut(label="positive", score=0.95)
 
 if __name__ == "__main__":
-    uvicorn.run("app:app", host="0.0.0.0", port=8000, log_level="info")
+    uvicorn.run(
+        "app:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=os.cpu_count() or 1,
+        loop="uvloop",
+        http="httptools",
+        log_level="warning",
+    )
@@ -1,11 +1,18 @@
 # /// script
-# dependencies = ["httpx>=0.27", "mohawk>=1.1.0", "pyjwt[crypto]>=2.8", "rich>=13.0", "typer>=0.12"]
+# dependencies = ["cryptography>=42", "httpx[http2]>=0.27", "pyjwt[crypto]>=2.8", "rich>=13.0", "typer>=0.12"]
 # ///
 
 from __future__ import annotations
 
+import asyncio
+import base64
+import hashlib
+import hmac
 import json
 import os
+import re
+import secrets
+import time
 from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
 from pathlib import Path
@@ -14,7 +21,8 @@ from typing import Literal
 import httpx
 import jwt
 import typer
-from mohawk import Sender
+from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
+from cryptography.hazmat.primitives.serialization import load_pem_private_key
 from rich.console import Console
 from rich.table import Table
 
@@ -23,6 +31,14 @@ ENDPOINTS = ["sentiment", "regression", "classification"]
 APISIX_BASE_URL = "http://localhost:9080"
 HAWK_BASE_URL = "http://localhost:9081"
 REQUEST_CONTENT_TYPE = "application/json"
+REQUEST_TIMEOUT_SECONDS = 5.0
+
+# mohawk derived host and port from the signed URL; signing the bare path left
+# the host empty and the port as the literal "None". Kept so MACs stay identical.
+HAWK_MAC_HOST = ""
+HAWK_MAC_PORT = "None"
+
+ENV_ASSIGNMENT_PATTERN = re.compile(rb'^([A-Z_][A-Z0-9_]*)="?([^"\r\n]*)"?[ \t\r]*$', re.MULTILINE)
 
 EXPECTED_PERMISSIONS = {
     "service_a": {"sentiment": True, "regression": True, "classification": False},
@@ -30,16 +46,38 @@ EXPECTED_PERMISSIONS = {
     "service_c": {"sentiment": True, "regression": False, "classification": True},
 }
 
+_MATRIX: tuple[tuple[str, str, bool], ...] = tuple(
+    (service, endpoint, EXPECTED_PERMISSIONS[service][endpoint])
+    for service in SERVICES
+    for endpoint in ENDPOINTS
+)
+
+_PATHS: dict[str, str] = {endpoint: f"/predict/{endpoint}" for endpoint in ENDPOINTS}
+_BASE_URLS: dict[str, str] = {"apisix": APISIX_BASE_URL, "hawk": HAWK_BASE_URL}
+_URLS: dict[tuple[str, str], str] = {
+    (mode, endpoint): f"{base_url}{path}"
+    for mode, base_url in _BASE_URLS.items()
+    for endpoint, path in _PATHS.items()
+}
+
 HAWK_CREDENTIALS = {
     "service_a": {"id": "service_a_id", "env": "SERVICE_A_HAWK_KEY"},
     "service_b": {"id": "service_b_id", "env": "SERVICE_B_HAWK_KEY"},
     "service_c": {"id": "service_c_id", "env": "SERVICE_C_HAWK_KEY"},
 }
 
+JWT_LIFETIME = timedelta(hours=1)
+JWT_REFRESH_MARGIN = timedelta(minutes=5)
+
 ProxyMode = Literal["apisix", "hawk"]
 
 app = typer.Typer(add_completion=False, no_args_is_help=False)
 
+_REQUEST_BODY: bytes = json.dumps({"text": "test input"}, separators=(",", ":")).encode("utf-8")
+
+_KEY_CACHE: dict[str, RSAPrivateKey] = {}
+_TOKEN_CACHE: dict[str, tuple[str, datetime]] = {}
+
 
 @dataclass
 class EndpointResult:
@@ -49,26 +87,42 @@ class EndpointResult:
 
 
 def create_request_body() -> bytes:
-    """Create a canonical JSON request body for smoke tests."""
-    return json.dumps({"text": "test input"}, separators=(",", ":")).encode("utf-8")
+    """Return the canonical JSON request body for smoke tests."""
+    return _REQUEST_BODY
+
+
+def load_private_key(service_name: str) -> RSAPrivateKey:
+    """Load and parse a service's RSA private key, once per process."""
+    key = _KEY_CACHE.get(service_name)
+    if key is None:
+        key_path = Path(__file__).parent / f"keys/{service_name}-private.pem"
+        parsed = load_pem_private_key(key_path.read_bytes(), password=None)
+        if not isinstance(parsed, RSAPrivateKey):
+            raise RuntimeError(f"Expected an RSA private key at {key_path}")
+        key = _KEY_CACHE[service_name] = parsed
+    return key
 
 
 def generate_jwt_token(service_name: str) -> str:
-    """Generate a JWT token for a service."""
-    key_path = Path(__file__).parent / f"keys/{service_name}-private.pem"
-    key = key_path.read_text()
+    """Generate a JWT token for a service, reusing one that is still comfortably valid."""
     now = datetime.now(UTC)
+    cached = _TOKEN_CACHE.get(service_name)
+    if cached is not None and cached[1] - now > JWT_REFRESH_MARGIN:
+        return cached[0]
 
-    return jwt.encode(
+    expires_at = now + JWT_LIFETIME
+    token = jwt.encode(
         {
             "sub": service_name,
             "key": f"iss_{service_name}",
             "nbf": now,
-            "exp": now + timedelta(hours=1),
+            "exp": expires_at,
         },
-        key,
+        load_private_key(service_name),
         algorithm="RS256",
     )
+    _TOKEN_CACHE[service_name] = (token, expires_at)
+    return token
 
 
 def validate_hawk_key_env() -> list[str]:
@@ -89,25 +143,29 @@ def load_hawk_keys_from_env_file() -> int:
 
     loaded = 0
     required_vars = {HAWK_CREDENTIALS[service]["env"] for service in SERVICES}
-    for line in env_file.read_text().splitlines():
-        if "=" not in line:
-            continue
-
-        key, raw_value = line.split("=", 1)
-        key = key.strip()
+    for raw_key, raw_value in ENV_ASSIGNMENT_PATTERN.findall(env_file.read_bytes()):
+        key = raw_key.decode("ascii")
         if key not in required_vars or os.getenv(key):
             continue
 
-        value = raw_value.strip()
-        if value.startswith('"') and value.endswith('"'):
-            value = value[1:-1]
-
-        os.environ[key] = value
+        os.environ[key] = raw_value.decode("utf-8")
         loaded += 1
 
     return loaded
 
 
+def hawk_payload_hash(body: bytes, content_type: str = REQUEST_CONTENT_TYPE) -> str:
+    """Return the base64 HAWK SHA-256 payload hash for a request body."""
+    normalised_type = content_type.split(";")[0].strip().lower()
+    digest = hashlib.sha256(
+        b"hawk.1.payload\n" + normalised_type.encode("utf-8") + b"\n" + body + b"\n"
+    ).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+
+_REQUEST_PAYLOAD_HASH = hawk_payload_hash(_REQUEST_BODY)
+
+
 def build_hawk_headers(service: str, path: str, method: str, body: bytes) -> dict[str, str]:
     """Build HAWK Authorization header for a request."""
     credentials = HAWK_CREDENTIALS[service]
@@ -118,46 +176,49 @@ def build_hawk_headers(service: str, path: str, method: str, body: bytes) -> dic
             f"Missing HAWK key in environment variable: {missing_var}"
         )
 
-    sender = Sender(
-        {"id": credentials["id"], "key": hawk_key, "algorithm": "sha256"},
-        path,
-        method,
-        content=body,
-        content_type=REQUEST_CONTENT_TYPE,
+    payload_hash = _REQUEST_PAYLOAD_HASH if body is _REQUEST_BODY else hawk_payload_hash(body)
+    timestamp = str(int(time.time()))
+    nonce = secrets.token_urlsafe(6)[:6]
+    normalised = (
+        f"hawk.1.header\n{timestamp}\n{nonce}\n{method}\n{path}\n"
+        f"{HAWK_MAC_HOST}\n{HAWK_MAC_PORT}\n{payload_hash}\n\n"
     )
-    auth_header = sender.request_header
-    if not isinstance(auth_header, str):
-        raise RuntimeError("Unable to generate HAWK authorisation header")
-
-    return {"Authorization": auth_header}
+    mac = base64.b64encode(
+        hmac.new(hawk_key.encode("ascii"), normalised.encode("utf-8"), hashlib.sha256).digest()
+    ).decode("ascii")
+
+    return {
+        "Authorization": (
+            f'Hawk mac="{mac}", hash="{payload_hash}", id="{credentials["id"]}", '
+            f'ts="{timestamp}", nonce="{nonce}"'
+        )
+    }
 
 
-def test_endpoint(
+async def test_endpoint(
+    client: httpx.AsyncClient,
     mode: ProxyMode,
     service: str,
     endpoint: str,
     jwt_token: str | None = None,
 ) -> EndpointResult:
     """Send a smoke-test request and return status details."""
-    path = f"/predict/{endpoint}"
-    body = create_request_body()
+    path = _PATHS[endpoint]
+    body = _REQUEST_BODY
     headers = {"Content-Type": REQUEST_CONTENT_TYPE}
 
     if mode == "apisix":
         if jwt_token is None:
             raise RuntimeError("JWT token is required for APISIX requests")
         headers["Authorization"] = jwt_token
-        base_url = APISIX_BASE_URL
     else:
         headers.update(build_hawk_headers(service=service, path=path, method="POST", body=body))
-        base_url = HAWK_BASE_URL
 
     try:
-        response = httpx.post(
-            f"{base_url}{path}",
+        response = await client.post(
+            _URLS[(mode, endpoint)],
             content=body,
             headers=headers,
-            timeout=5.0,
         )
         return EndpointResult(
             status_code=response.status_code,
@@ -172,6 +233,14 @@ def test_endpoint(
         )
 
 
+async def warm_connection(client: httpx.AsyncClient, mode: ProxyMode) -> None:
+    """Open the proxy connection ahead of the matrix so probes share it."""
+    try:
+        await client.head(_BASE_URLS[mode])
+    except httpx.RequestError:
+        pass
+
+
 def result_matches_expectation(status_code: int, expected_allowed: bool) -> bool:
     """Check whether a status code matches expected allow/deny behaviour."""
     if expected_allowed:
@@ -188,7 +257,7 @@ def format_result(status_code: int, expected_allowed: bool) -> str:
     return f"[red]✗ {status_code}[/red]"
 
 
-def run_mode(console: Console, mode: ProxyMode) -> bool:
+async def run_mode(console: Console, client: httpx.AsyncClient, mode: ProxyMode) -> bool:
     """Run smoke tests for one proxy mode and return overall pass/fail."""
     mode_label = "APISIX" if mode == "apisix" else "HAWK"
     console.print(f"\n[bold cyan]{mode_label} consumer permission matrix validation[/bold cyan]\n")
@@ -214,14 +283,23 @@ def run_mode(console: Console, mode: ProxyMode) -> bool:
         console.print("[green]✓ HAWK credentials loaded[/green]\n")
 
     console.print("[yellow]Testing all service-endpoint combinations...[/yellow]\n")
-    results: dict[str, dict[str, EndpointResult]] = {}
-
-    for service in SERVICES:
-        results[service] = {}
-        for endpoint in ENDPOINTS:
-            token = tokens.get(service)
-            result = test_endpoint(mode=mode, service=service, endpoint=endpoint, jwt_token=token)
-            results[service][endpoint] = result
+    await warm_connection(client=client, mode=mode)
+    responses = await asyncio.gather(
+        *(
+            test_endpoint(
+                client=client,
+                mode=mode,
+                service=service,
+                endpoint=endpoint,
+                jwt_token=tokens.get(service),
+            )
+            for service, endpoint, _ in _MATRIX
+        )
+    )
+    results: dict[tuple[str, str], EndpointResult] = {
+        (service, endpoint): result
+        for (service, endpoint, _), result in zip(_MATRIX, responses)
+    }
 
     table = Table(
         title=f"{mode_label} consumer permission matrix - test results",
@@ -232,24 +310,21 @@ def run_mode(console: Console, mode: ProxyMode) -> bool:
     for endpoint in ENDPOINTS:
         table.add_column(endpoint, justify="center", width=15)
 
-    for service in SERVICES:
-        row = [service]
-        for endpoint in ENDPOINTS:
-            status_code = results[service][endpoint].status_code
-            expected_allowed = EXPECTED_PERMISSIONS[service][endpoint]
-            row.append(format_result(status_code, expected_allowed))
+    rows: dict[str, list[str]] = {service: [service] for service in SERVICES}
+    for service, endpoint, expected_allowed in _MATRIX:
+        status_code = results[(service, endpoint)].status_code
+        rows[service].append(format_result(status_code, expected_allowed))
+    for row in rows.values():
         table.add_row(*row)
 
     console.print(table)
     console.print("\n[bold]Validation summary:[/bold]")
 
     mismatches: list[tuple[str, str, bool, EndpointResult]] = []
-    for service in SERVICES:
-        for endpoint in ENDPOINTS:
-            endpoint_result = results[service][endpoint]
-            expected_allowed = EXPECTED_PERMISSIONS[service][endpoint]
-            if not result_matches_expectation(endpoint_result.status_code, expected_allowed):
-                mismatches.append((service, endpoint, expected_allowed, endpoint_result))
+    for service, endpoint, expected_allowed in _MATRIX:
+        endpoint_result = results[(service, endpoint)]
+        if not result_matches_expectation(endpoint_result.status_code, expected_allowed):
+            mismatches.append((service, endpoint, expected_allowed, endpoint_result))
 
     if not mismatches:
         console.print(f"[bold green]✓ {mode_label} permissions match the expected matrix[/bold green]")
@@ -266,7 +341,7 @@ def run_mode(console: Console, mode: ProxyMode) -> bool:
     console.print("\n[bold yellow]Debug information for mismatches:[/bold yellow]\n")
     for service, endpoint, expected_allowed, endpoint_result in mismatches:
         console.print(f"[cyan]Service:[/cyan] {service}")
-        console.print(f"[cyan]Endpoint:[/cyan] /predict/{endpoint}")
+        console.print(f"[cyan]Endpoint:[/cyan] {_PATHS[endpoint]}")
         console.print(f"[cyan]Expected:[/cyan] {'Allowed (200)' if expected_allowed else 'Denied (401/403)'}")
         console.print(f"[cyan]Actual status:[/cyan] {endpoint_result.status_code} {endpoint_result.status_text}")
         console.print("[cyan]Response body:[/cyan]")
@@ -276,6 +351,34 @@ def run_mode(console: Console, mode: ProxyMode) -> bool:
     return False
 
 
+def create_client() -> httpx.AsyncClient:
+    """Create the HTTP client shared by every proxy mode in a run."""
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        timeout=REQUEST_TIMEOUT_SECONDS,
+    )
+
+
+async def run_modes(apisix: bool, hawk: bool) -> bool:
+    """Run the selected proxy modes over one shared client and return overall pass/fail."""
+    console = Console()
+    overall_success = True
+
+    async with create_client() as client:
+        if apisix:
+            overall_success = (
+                await run_mode(console=console, client=client, mode="apisix") and overall_success
+            )
+
+        if hawk:
+            overall_success = (
+                await run_mode(console=console, client=client, mode="hawk") and overall_success
+            )
+
+    return overall_success
+
+
 @app.command()
 def main(
     context: typer.Context,
@@ -296,16 +399,7 @@ def main(
         typer.echo("\nError: pass --apisix and/or --hawk.", err=True)
         raise typer.Exit(code=2)
 
-    console = Console()
-    overall_success = True
-
-    if apisix:
-        overall_success = run_mode(console=console, mode="apisix") and overall_success
-
-    if hawk:
-        overall_success = run_mode(console=console, mode="hawk") and overall_success
-
-    if not overall_success:
+    if not asyncio.run(run_modes(apisix=apisix, hawk=hawk)):
         raise typer.Exit(code=1)
 
 